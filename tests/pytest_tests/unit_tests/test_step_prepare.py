@@ -1,3 +1,4 @@
+import concurrent.futures
 import dataclasses
 import queue
 from typing import TYPE_CHECKING, Iterable, Mapping, Tuple
@@ -29,7 +30,7 @@ def simple_file_spec(name: str) -> "CreateArtifactFileSpecInput":
 
 
 def simple_request_prepare(name: str) -> RequestPrepare:
-    return RequestPrepare(simple_file_spec(name=name), queue.Queue())
+    return RequestPrepare(simple_file_spec(name=name), concurrent.futures.Future())
 
 
 def mock_create_artifact_files_result(
@@ -93,10 +94,7 @@ class TestMockRequestQueue:
         clock = MockClock()
         q = MockRequestQueue(
             clock,
-            [
-                (t, RequestPrepare(simple_file_spec(f"req-{t}"), queue.Queue()))
-                for t in [1, 3, 10, 30]
-            ],
+            [(t, simple_request_prepare(f"req-{t}")) for t in [1, 3, 10, 30]],
         )
         assert q.get().file_spec["name"] == "req-1"
         assert clock() == 1
@@ -244,6 +242,28 @@ class TestGatherBatch:
         assert [f.file_spec["name"] for f in batch] == ["a"]
         assert q.get.call_count == 2
 
+    def test_drains_queued_requests(self):
+        q = queue.Queue()
+        for name in ["a", "b", "c"]:
+            q.put(simple_request_prepare(name))
+        q.put(RequestFinish())
+        q.put(simple_request_prepare("d"))
+
+        done, batch = gather_batch(q, 0.1, 0.1, 100)
+        assert done
+        assert [f.file_spec["name"] for f in batch] == ["a", "b", "c"]
+        assert q.get().file_spec["name"] == "d"
+
+    def test_drain_respects_batch_size(self):
+        q = queue.Queue()
+        for name in ["a", "b", "c"]:
+            q.put(simple_request_prepare(name))
+
+        done, batch = gather_batch(q, 0.1, 0.1, 2)
+        assert not done
+        assert [f.file_spec["name"] for f in batch] == ["a", "b"]
+        assert q.qsize() == 1
+
 
 class TestStepPrepare:
     def test_smoke(self):
@@ -273,12 +293,12 @@ class TestStepPrepare:
         )
         step_prepare.start()
 
-        queue_a = step_prepare.prepare_async(simple_file_spec(name="a"))
-        queue_b = step_prepare.prepare_async(simple_file_spec(name="b"))
+        future_a = step_prepare.prepare_async(simple_file_spec(name="a"))
+        future_b = step_prepare.prepare_async(simple_file_spec(name="b"))
         step_prepare.finish()
 
-        res_a = queue_a.get()
-        res_b = queue_b.get()
+        res_a = future_a.result()
+        res_b = future_b.result()
 
         assert res_a.upload_url == caf_result["a"]["uploadUrl"]
         assert res_b.upload_url == caf_result["b"]["uploadUrl"]
@@ -288,6 +308,44 @@ class TestStepPrepare:
 
         api.create_artifact_files.assert_called_once()
 
+    def test_dedupes_identical_file_specs(self):
+        caf_result = mock_create_artifact_files_result(["a"])
+        api = Mock(create_artifact_files=Mock(return_value=caf_result))
+
+        step_prepare = StepPrepare(
+            api=api, batch_time=1, inter_event_time=1, max_batch_size=10
+        )
+        step_prepare.start()
+
+        futures = [
+            step_prepare.prepare_async(simple_file_spec(name="a")) for _ in range(3)
+        ]
+        step_prepare.finish()
+
+        for future in futures:
+            assert future.result(timeout=5).upload_url == caf_result["a"]["uploadUrl"]
+
+        api.create_artifact_files.assert_called_once_with([simple_file_spec(name="a")])
+
+    def test_api_error_fails_batch_and_keeps_running(self):
+        caf_result = mock_create_artifact_files_result(["b"])
+        api = Mock(
+            create_artifact_files=Mock(side_effect=[RuntimeError("boom"), caf_result])
+        )
+
+        step_prepare = StepPrepare(
+            api=api, batch_time=1e-12, inter_event_time=1e-12, max_batch_size=1
+        )
+        step_prepare.start()
+
+        with pytest.raises(RuntimeError, match="boom"):
+            step_prepare.prepare(simple_file_spec(name="a"))
+
+        res = step_prepare.prepare(simple_file_spec(name="b"))
+        step_prepare.finish()
+
+        assert res.upload_url == caf_result["b"]["uploadUrl"]
+
     def test_finish_waits_for_pending_requests(self):
         caf_result = mock_create_artifact_files_result(["a", "b"])
         api = Mock(create_artifact_files=Mock(return_value=caf_result))
@@ -297,16 +355,16 @@ class TestStepPrepare:
         )
         step_prepare.start()
 
-        res_q = step_prepare.prepare_async(simple_file_spec(name="a"))
+        res_future = step_prepare.prepare_async(simple_file_spec(name="a"))
 
-        with pytest.raises(queue.Empty):
-            res_q.get(timeout=1e-12)
+        with pytest.raises(concurrent.futures.TimeoutError):
+            res_future.result(timeout=1e-12)
 
         assert step_prepare.is_alive()
 
         step_prepare.finish()
 
-        res = res_q.get(timeout=5)
+        res = res_future.result(timeout=5)
 
         assert res.upload_url == caf_result["a"]["uploadUrl"]
 
@@ -1,7 +1,6 @@
 import itertools
 import json
 import threading
-import time
 from unittest import mock
 
 import pytest
@@ -944,13 +943,12 @@ def test_trainium(test_settings):
 
         trainium.start()
 
-        # wait for the mock data to be processed indefinitely,
-        # until the test times out in the worst case
-        while interface.metrics_queue.empty():
-            time.sleep(0.1)
+        # block until the mock data has been processed,
+        # failing with queue.Empty after 25 seconds in the worst case
+        metrics = interface.metrics_queue.get(timeout=25)
 
         shutdown_event.set()
         trainium.finish()
 
-        assert not interface.metrics_queue.empty()
+        assert metrics
         assert not interface.telemetry_queue.empty()
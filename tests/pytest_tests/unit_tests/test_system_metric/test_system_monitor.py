@@ -1,4 +1,5 @@
 import multiprocessing as mp
+import threading
 import time
 from collections import deque
 from typing import TYPE_CHECKING, Any
@@ -26,6 +27,18 @@ if TYPE_CHECKING:
     from typing import Deque
 
 
+class SignalingAssetInterface(AssetInterface):
+    """AssetInterface that signals when the first metrics are published."""
+
+    def __init__(self) -> None:
+        super().__init__()
+        self.published = threading.Event()
+
+    def publish_stats(self, stats: dict) -> None:
+        super().publish_stats(stats)
+        self.published.set()
+
+
 class MockMetric:
     name: str = "mock_metric"
     # at first, we will only support the gauge type
@@ -128,7 +141,7 @@ def test_metrics_monitor(capsys, test_settings):
     mock_metric = MockMetric()
     mock_broken_metric = MockBrokenMetric()
     metrics = [mock_metric, mock_broken_metric]
-    interface = AssetInterface()
+    interface = SignalingAssetInterface()
     settings = SettingsStatic(
         test_settings(
             dict(
@@ -147,7 +160,7 @@ def test_metrics_monitor(capsys, test_settings):
         shutdown_event=shutdown_event,
     )
     metrics_monitor.start()
-    time.sleep(1)
+    assert interface.published.wait(timeout=5)
     shutdown_event.set()
     metrics_monitor.finish()
 
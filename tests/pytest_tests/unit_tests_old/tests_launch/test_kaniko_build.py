@@ -1,8 +1,9 @@
-import base64
 import configparser
+import io
 import json
 import os
 import sys
+import tarfile
 from unittest.mock import MagicMock
 
 import boto3
@@ -14,9 +15,12 @@ from wandb.sdk.launch._project_spec import EntryPoint, LaunchProject
 from wandb.sdk.launch.builder.kaniko import (
     KanikoBuilder,
     _create_dockerfile_configmap,
+    _gcs_client,
+    _s3_client,
     _wait_for_completion,
+    _write_build_context,
 )
-from wandb.sdk.launch.utils import LaunchError
+from wandb.sdk.launch.utils import LaunchError, _get_kube_api_client
 
 from tests.pytest_tests.unit_tests_old.utils import fixture_open
 
@@ -40,6 +44,11 @@ def mock_kubernetes_client(monkeypatch):
     # test success is true
     mock_job_status.succeeded = 1
     mock_api_client().read_namespaced_job_status.return_value = mock_job
+    mock_watch = MagicMock(name="mock_watch")
+    mock_watch.stream.side_effect = lambda *args, **kwargs: iter(
+        [{"type": "MODIFIED", "object": mock_job}]
+    )
+    monkeypatch.setattr(kubernetes.watch, "Watch", lambda: mock_watch)
     monkeypatch.setattr(kubernetes.client, "BatchV1Api", mock_api_client)
     monkeypatch.setattr(kubernetes.client, "CoreV1Api", MagicMock())
 
@@ -54,7 +63,9 @@ def mock_kubernetes_client(monkeypatch):
     monkeypatch.setattr(kubernetes.client, "V1ConfigMapVolumeSource", return_kwargs)
     monkeypatch.setattr(kubernetes.client, "V1ObjectMeta", return_kwargs)
     monkeypatch.setattr(kubernetes.config, "load_incluster_config", return_kwargs)
+    _get_kube_api_client.cache_clear()
     yield mock_api_client
+    _get_kube_api_client.cache_clear()
 
 
 @pytest.fixture
@@ -72,22 +83,42 @@ def mock_V1ConfigMap(monkeypatch):
 @pytest.fixture
 def mock_boto3(monkeypatch):
     monkeypatch.setattr(boto3, "client", MagicMock())
+    _s3_client.cache_clear()
+    yield
+    _s3_client.cache_clear()
 
 
 @pytest.fixture
 def mock_storage_client(monkeypatch):
     monkeypatch.setattr(storage, "Client", MagicMock())
+    _gcs_client.cache_clear()
+    yield
+    _gcs_client.cache_clear()
 
 
-def test_wait_for_completion():
+def test_wait_for_completion(monkeypatch):
     mock_api_client = MagicMock()
     mock_job = MagicMock()
     mock_job_status = MagicMock()
     mock_job.status = mock_job_status
+    mock_watch = MagicMock()
+    mock_watch.stream.side_effect = lambda *args, **kwargs: iter(
+        [{"type": "MODIFIED", "object": mock_job}]
+    )
+    monkeypatch.setattr(kubernetes.watch, "Watch", lambda: mock_watch)
+    mock_time = MagicMock()
+    mock_time.monotonic.return_value = 0
+    monkeypatch.setattr(wandb.sdk.launch.builder.kaniko, "time", mock_time)
     # test success is true
     mock_job_status.succeeded = 1
-    mock_api_client.read_namespaced_job_status.return_value = mock_job
     assert _wait_for_completion(mock_api_client, "test", 60)
+    mock_watch.stream.assert_called_with(
+        mock_api_client.list_namespaced_job,
+        namespace="wandb",
+        field_selector="metadata.name=test",
+        timeout_seconds=60,
+    )
+    mock_watch.stop.assert_called()
 
     # test failed is false
     mock_job_status.succeeded = None
@@ -96,25 +127,34 @@ def test_wait_for_completion():
 
     # test timeout is false
     mock_job_status.failed = None
+    mock_time.monotonic.side_effect = iter(range(0, 100, 3))
     assert _wait_for_completion(mock_api_client, "test", 5) is False
 
 
-def test_create_dockerfile_configmap(
-    monkeypatch, runner, mock_V1ConfigMap, mock_V1ObjectMeta
-):
-    with runner.isolated_filesystem():
-        os.makedirs("./test/context/path/", exist_ok=True)
-        with open("./test/context/path/Dockerfile.wandb-autogenerated", "wb") as f:
-            f.write(b"docker file test contents")
-        result = _create_dockerfile_configmap("test_name", "./test/context/path/")
-        assert result["metadata"]["name"] == "test_name"
-        assert result["metadata"]["namespace"] == "wandb"
-        assert result["metadata"]["labels"] == {"wandb": "launch"}
-        assert result["binary_data"]["Dockerfile"] == base64.b64encode(
-            b"docker file test contents"
-        ).decode("UTF-8")
+def test_wait_for_completion_rewatches(monkeypatch):
+    mock_api_client = MagicMock()
+    mock_job = MagicMock()
+    mock_job.status.succeeded = 1
+    mock_watch = MagicMock()
+    # the first watch ends without an event, as if the connection dropped
+    mock_watch.stream.side_effect = [
+        iter([]),
+        iter([{"type": "MODIFIED", "object": mock_job}]),
+    ]
+    monkeypatch.setattr(kubernetes.watch, "Watch", lambda: mock_watch)
+    assert _wait_for_completion(mock_api_client, "test", 60)
+    assert mock_watch.stream.call_count == 2
+
 
-        assert result["immutable"] is True
+def test_create_dockerfile_configmap(monkeypatch, mock_V1ConfigMap, mock_V1ObjectMeta):
+    result = _create_dockerfile_configmap("test_name", "docker file test contents")
+    assert result["metadata"]["name"] == "test_name"
+    assert result["metadata"]["namespace"] == "wandb"
+    assert result["metadata"]["labels"] == {"wandb": "launch"}
+    assert result["data"]["Dockerfile"] == "docker file test contents"
+    assert "binary_data" not in result
+
+    assert result["immutable"] is True
 
 
 def test_create_docker_ecr_config_map_non_instance(
@@ -204,11 +244,154 @@ def test_upload_build_context_aws(monkeypatch, runner, mock_boto3):
         os.makedirs("./test/context/path/", exist_ok=True)
         with open("./test/context/path/blah.txt", "wb") as f:
             f.write(b"test contents")
+        project = MagicMock(project_dir="./test/context/path/", python_version=None)
         builder = KanikoBuilder(build_config)
-        returned_path = builder._upload_build_context(run_id, "./test/context/path/")
+        returned_path = builder._upload_build_context(
+            run_id, project, "docker file test contents"
+        )
         assert returned_path == f"s3://{context_store_url}/{run_id}.tgz"
 
 
+def test_upload_build_context_reuses_client(monkeypatch, runner, mock_boto3):
+    build_config = {
+        "cloud-provider": "AWS",
+        "build-context-store": "test-url",
+        "credentials": {
+            "secret-name": "aws-secret",
+            "secret-mount-path": "/root/.aws/",
+        },
+    }
+    with runner.isolated_filesystem():
+        os.makedirs("./test/context/path/", exist_ok=True)
+        with open("./test/context/path/blah.txt", "wb") as f:
+            f.write(b"test contents")
+        project = MagicMock(project_dir="./test/context/path/", python_version=None)
+        builder = KanikoBuilder(build_config)
+        builder._upload_build_context("12345678", project, "docker file test contents")
+        builder._upload_build_context("87654321", project, "docker file test contents")
+        assert boto3.client.call_count == 1
+
+
+def test_upload_build_context_streams_archive(runner, mock_boto3):
+    build_config = {
+        "cloud-provider": "AWS",
+        "build-context-store": "test-url",
+        "credentials": {
+            "secret-name": "aws-secret",
+            "secret-mount-path": "/root/.aws/",
+        },
+    }
+    uploaded = {}
+
+    def upload_fileobj(context_file, bucket, key):
+        uploaded[key] = context_file.read()
+
+    boto3.client.return_value.upload_fileobj.side_effect = upload_fileobj
+    with runner.isolated_filesystem():
+        os.makedirs("./test/context/path/", exist_ok=True)
+        with open("./test/context/path/blah.txt", "wb") as f:
+            f.write(b"test contents")
+        project = MagicMock(project_dir="./test/context/path/", python_version=None)
+        builder = KanikoBuilder(build_config)
+        builder._upload_build_context("12345678", project, "docker file test contents")
+
+    with tarfile.open(fileobj=io.BytesIO(uploaded["12345678.tgz"])) as context_tar:
+        blah = context_tar.extractfile("src/blah.txt")
+        assert blah.read() == b"test contents"
+        dockerfile = context_tar.extractfile("Dockerfile.wandb-autogenerated")
+        assert dockerfile.read() == b"docker file test contents"
+
+
+def test_upload_build_context_producer_error(monkeypatch, runner, mock_boto3):
+    build_config = {
+        "cloud-provider": "AWS",
+        "build-context-store": "test-url",
+        "credentials": {
+            "secret-name": "aws-secret",
+            "secret-mount-path": "/root/.aws/",
+        },
+    }
+    upload_errors = []
+
+    def add_docker_build_ctx(context_tar, launch_project, dockerfile_contents):
+        context_tar.addfile(tarfile.TarInfo("src/partial.txt"))
+        raise OSError("disk went away")
+
+    def upload_fileobj(context_file, bucket, key):
+        # the upload has to see the failure, so it aborts instead of completing
+        try:
+            while context_file.read(1024):
+                pass
+        except LaunchError as e:
+            upload_errors.append(e)
+            raise
+
+    monkeypatch.setattr(
+        "wandb.sdk.launch.builder.kaniko._add_docker_build_ctx", add_docker_build_ctx
+    )
+    boto3.client.return_value.upload_fileobj.side_effect = upload_fileobj
+    with runner.isolated_filesystem():
+        project = MagicMock(project_dir="./test/context/path/", python_version=None)
+        builder = KanikoBuilder(build_config)
+        with pytest.raises(LaunchError, match="disk went away"):
+            builder._upload_build_context(
+                "12345678", project, "docker file test contents"
+            )
+    assert len(upload_errors) == 1
+
+
+@pytest.mark.timeout(30)
+def test_upload_build_context_upload_error(runner, mock_boto3):
+    build_config = {
+        "cloud-provider": "AWS",
+        "build-context-store": "test-url",
+        "credentials": {
+            "secret-name": "aws-secret",
+            "secret-mount-path": "/root/.aws/",
+        },
+    }
+
+    def upload_fileobj(context_file, bucket, key):
+        context_file.read(1024)
+        raise ConnectionError("connection reset")
+
+    boto3.client.return_value.upload_fileobj.side_effect = upload_fileobj
+    with runner.isolated_filesystem():
+        os.makedirs("./test/context/path/", exist_ok=True)
+        # incompressible and larger than the pipe buffer, so the producer blocks
+        with open("./test/context/path/blah.bin", "wb") as f:
+            f.write(os.urandom(4 << 20))
+        project = MagicMock(project_dir="./test/context/path/", python_version=None)
+        builder = KanikoBuilder(build_config)
+        with pytest.raises(LaunchError, match="connection reset"):
+            builder._upload_build_context(
+                "12345678", project, "docker file test contents"
+            )
+
+
+def test_write_build_context(runner):
+    with runner.isolated_filesystem():
+        os.makedirs("./test/context/path/", exist_ok=True)
+        with open("./test/context/path/blah.txt", "wb") as f:
+            f.write(b"test contents")
+        with open("./test/context/path/runtime.txt", "wb") as f:
+            f.write(b"python-2.7")
+        project = MagicMock(project_dir="./test/context/path/", python_version="3.8")
+        context_file = io.BytesIO()
+        _write_build_context(project, "docker file test contents", context_file)
+
+    context_file.seek(0)
+    with tarfile.open(fileobj=context_file, mode="r:gz") as context_tar:
+        names = context_tar.getnames()
+        assert "src/blah.txt" in names
+        assert "_wandb_bootstrap.py" in names
+        assert names.count("src/runtime.txt") == 1
+        runtime = context_tar.extractfile("src/runtime.txt")
+        assert runtime.read() == b"python-3.8"
+        dockerfile = context_tar.extractfile("Dockerfile.wandb-autogenerated")
+        assert dockerfile.read() == b"docker file test contents"
+
+
 def test_upload_build_context_gcp(monkeypatch, runner, mock_storage_client):
     context_store_url = "test-url"
     run_id = "12345678"
@@ -224,8 +407,11 @@ def test_upload_build_context_gcp(monkeypatch, runner, mock_storage_client):
         os.makedirs("./test/context/path/", exist_ok=True)
         with open("./test/context/path/blah.txt", "wb") as f:
             f.write(b"test contents")
+        project = MagicMock(project_dir="./test/context/path/", python_version=None)
         builder = KanikoBuilder(build_config)
-        returned_path = builder._upload_build_context(run_id, "./test/context/path/")
+        returned_path = builder._upload_build_context(
+            run_id, project, "docker file test contents"
+        )
         assert returned_path == f"gs://{context_store_url}/{run_id}.tgz"
 
 
@@ -242,9 +428,12 @@ def test_upload_build_context_err(monkeypatch, runner, mock_boto3):
         os.makedirs("./test/context/path/", exist_ok=True)
         with open("./test/context/path/blah.txt", "wb") as f:
             f.write(b"test contents")
+        project = MagicMock(project_dir="./test/context/path/", python_version=None)
         builder = KanikoBuilder(build_config)
         with pytest.raises(LaunchError):
-            builder._upload_build_context("12345678", "./test/context/path/")
+            builder._upload_build_context(
+                "12345678", project, "docker file test contents"
+            )
 
 
 def test_create_kaniko_job_static(mock_kubernetes_client, runner):
@@ -422,6 +611,39 @@ def test_build_image_success(
         assert image_uri == f"repository-url:{project.run_id}"
 
 
+def test_create_kaniko_job_snapshot_mode(mock_kubernetes_client):
+    build_config = {
+        "cloud-provider": "AWS",
+        "build-context-store": "s3",
+        "credentials": {
+            "secret-name": "aws-secret",
+            "secret-mount-path": "/root/.aws",
+        },
+        "snapshot-mode": "time",
+    }
+    builder = KanikoBuilder(build_config)
+    job = builder._create_kaniko_job(
+        "test_job_name",
+        "wandb-launch-build-context",
+        "repository-url",
+        "image_tag:12345678",
+        "s3://s3/12345678.tgz",
+    )
+    args = job["spec"]["template"]["spec"]["containers"][0]["args"]
+    assert "--snapshotMode=time" in args
+
+
+def test_kaniko_build_invalid_snapshot_mode():
+    with pytest.raises(LaunchError):
+        KanikoBuilder(
+            {
+                "cloud-provider": "AWS",
+                "build-context-store": "s3",
+                "snapshot-mode": "fast",
+            }
+        )
+
+
 def test_kaniko_build_no_cloud_provider():
     with pytest.raises(LaunchError):
         KanikoBuilder({"cloud-provider": "AWS"})
@@ -239,6 +239,7 @@ def test_launch_no_docker_exec(
     monkeypatch.setattr(
         wandb.sdk.launch.builder.build, "find_executable", lambda name: False
     )
+    wandb.sdk.launch.builder.build.validate_docker_installation.cache_clear()
     result = runner.invoke(
         cli.launch,
         ["https://wandb.ai/mock_server_entity/test_project/runs/1"],
@@ -1,4 +1,5 @@
 import base64
+import datetime
 import json
 from unittest.mock import MagicMock
 
@@ -8,10 +9,17 @@ import pytest
 import wandb
 import wandb.sdk.launch.launch as launch
 from wandb.sdk.launch.runner.kubernetes import (
+    _STATUS_CHECK_INTERVAL,
     MAX_KUBERNETES_RETRIES,
+    KubernetesSubmittedRun,
     maybe_create_imagepull_secret,
 )
-from wandb.sdk.launch.utils import LaunchError, make_name_dns_safe
+from wandb.sdk.launch.utils import (
+    LaunchError,
+    _get_kube_api_client,
+    get_kube_context_and_api_client,
+    make_name_dns_safe,
+)
 
 from .test_launch import mock_load_backend, mocked_fetchable_git_repo  # noqa: F401
 
@@ -128,6 +136,8 @@ def setup_mock_kubernetes_client(monkeypatch, jobs, pods, mock_job_base):
         jobs_dict[name] = mock_job
         return [[mock_job]]
 
+    # don't reuse an api client cached by an earlier test
+    _get_kube_api_client.cache_clear()
     monkeypatch.setattr(
         kubernetes.config,
         "list_kube_config_contexts",
@@ -598,6 +608,39 @@ def test_get_status_failed(
         assert "Failed to start job" in str(e.value)
 
 
+def test_wait_watches_job(monkeypatch):
+    running_job = MagicMock()
+    running_job.metadata.resource_version = "1"
+    running_job.status = MockDict(
+        {"succeeded": None, "failed": None, "active": 1, "conditions": None}
+    )
+    finished_job = MagicMock()
+    finished_job.metadata.resource_version = "2"
+    finished_job.status = MockDict(
+        {"succeeded": 1, "failed": None, "active": None, "conditions": None}
+    )
+    batch_api = MagicMock()
+    batch_api.read_namespaced_job_status.side_effect = [running_job, finished_job]
+    mock_watch = MagicMock()
+    mock_watch.stream.side_effect = lambda *args, **kwargs: iter(
+        [{"type": "MODIFIED", "object": finished_job}]
+    )
+    monkeypatch.setattr(kubernetes.watch, "Watch", lambda: mock_watch)
+    mock_time = MagicMock()
+    monkeypatch.setattr(wandb.sdk.launch.runner.kubernetes, "time", mock_time)
+
+    run = KubernetesSubmittedRun(batch_api, MagicMock(), "test-job", ["pod1"])
+    assert run.wait()
+    mock_watch.stream.assert_called_once_with(
+        batch_api.list_namespaced_job,
+        namespace="default",
+        field_selector="metadata.name=test-job",
+        resource_version="1",
+        timeout_seconds=_STATUS_CHECK_INTERVAL,
+    )
+    mock_time.sleep.assert_not_called()
+
+
 def test_maybe_create_imagepull_secret_none():
     secret = maybe_create_imagepull_secret(MagicMock(), {}, "12345678", "wandb")
     assert secret is None
@@ -641,6 +684,34 @@ def test_maybe_create_imagepull_secret_given_creds(runner, monkeypatch):
     )
 
 
+def test_maybe_create_imagepull_secret_reuses_token(runner, monkeypatch):
+    mock_client = MagicMock()
+    mock_client().get_authorization_token.return_value = {
+        "authorizationData": [
+            {
+                "authorizationToken": base64.b64encode(b"AWS:faketesttoken").decode(),
+                "expiresAt": datetime.datetime.now(datetime.timezone.utc)
+                + datetime.timedelta(hours=12),
+            }
+        ]
+    }
+    monkeypatch.setattr(boto3, "client", mock_client)
+    monkeypatch.setattr(
+        wandb.sdk.launch.runner.kubernetes, "_ecr_authorization_token", None
+    )
+    registry_config = {
+        "ecr-provider": "AWS",
+        "url": "12345678.dkr.ecr.us-east-1.amazonaws.com:test-repo",
+        "credentials": {"secret-name": "aws-secret", "secret-mount-path": "./test"},
+    }
+    for run_id in ("12345678", "87654321"):
+        secret = maybe_create_imagepull_secret(
+            MagicMock(), registry_config, run_id, "wandb"
+        )
+        assert secret.metadata.name == f"regcred-{run_id}"
+    mock_client().get_authorization_token.assert_called_once()
+
+
 def test_maybe_create_imagepull_secret_invalid_provider(runner, monkeypatch):
     mock_client = MagicMock()
     mock_client().get_authorization_token.return_value = {
@@ -662,3 +733,35 @@ def test_maybe_create_imagepull_secret_invalid_provider(runner, monkeypatch):
             "12345678",
             "wandb",
         )
+
+
+def test_get_kube_context_and_api_client_follows_active_context(monkeypatch):
+    contexts = [{"name": "context-a"}, {"name": "context-b"}]
+    active = {"context": contexts[0]}
+    _get_kube_api_client.cache_clear()
+    monkeypatch.setattr(
+        kubernetes.config,
+        "list_kube_config_contexts",
+        lambda config_file: (contexts, active["context"]),
+    )
+    monkeypatch.setattr(
+        kubernetes.config, "load_kube_config", lambda config_file, context_name: None
+    )
+    monkeypatch.setattr(
+        kubernetes.config,
+        "new_client_from_config",
+        lambda config_file, context: MagicMock(context=context),
+    )
+    resource_args = {"config_file": "./test/kube/config"}
+
+    context, first = get_kube_context_and_api_client(kubernetes, resource_args)
+    assert context["name"] == "context-a"
+    _, again = get_kube_context_and_api_client(kubernetes, resource_args)
+    assert again is first
+
+    active["context"] = contexts[1]
+    context, switched = get_kube_context_and_api_client(kubernetes, resource_args)
+    assert context["name"] == "context-b"
+    assert switched is not first
+    assert switched.context == "context-b"
+    _get_kube_api_client.cache_clear()
@@ -1,11 +1,13 @@
 """Batching file prepare requests to our API."""
 
+import concurrent.futures
 import queue
 import threading
 import time
 from typing import (
     TYPE_CHECKING,
     Callable,
+    Dict,
     List,
     Mapping,
     NamedTuple,
@@ -26,7 +28,7 @@ if TYPE_CHECKING:
 # Request for a file to be prepared.
 class RequestPrepare(NamedTuple):
     file_spec: "CreateArtifactFileSpecInput"
-    response_queue: "queue.Queue[ResponsePrepare]"
+    result_future: "concurrent.futures.Future[ResponsePrepare]"
 
 
 class RequestFinish(NamedTuple):
@@ -42,8 +44,30 @@ class ResponsePrepare(NamedTuple):
 Request = Union[RequestPrepare, RequestFinish]
 
 
-def _clamp(x: float, low: float, high: float) -> float:
-    return max(low, min(x, high))
+def _drain_queued(
+    request_queue: "queue.Queue[Request]",
+    batch: List[RequestPrepare],
+    max_batch_size: int,
+) -> bool:
+    """Move already-queued requests into the batch under a single lock acquisition.
+
+    Returns:
+        True if a RequestFinish was dequeued while draining.
+    """
+    finish = False
+    with request_queue.mutex:
+        pending = request_queue.queue
+        queued = len(pending)
+        while pending and len(batch) < max_batch_size:
+            request = pending.popleft()
+            if isinstance(request, RequestFinish):
+                finish = True
+                break
+            batch.append(request)
+        if len(pending) < queued:
+            # wake producers blocked on a bounded queue, as Queue.get would
+            request_queue.not_full.notify_all()
+    return finish
 
 
 def gather_batch(
@@ -54,32 +78,35 @@ def gather_batch(
     clock: Callable[[], float] = time.monotonic,
 ) -> Tuple[bool, Sequence[RequestPrepare]]:
 
-    batch_start_time = clock()
+    deadline = clock() + batch_time
     remaining_time = batch_time
+    get_request = request_queue.get
 
-    first_request = request_queue.get()
+    first_request = get_request()
     if isinstance(first_request, RequestFinish):
         return True, []
 
     batch: List[RequestPrepare] = [first_request]
 
+    # requests that are already waiting don't need a timed get each; only the
+    # plain FIFO queue exposes its deque, other queue types take the slow path
+    if type(request_queue) is queue.Queue:
+        if _drain_queued(request_queue, batch, max_batch_size):
+            return True, batch
+
     while remaining_time > 0 and len(batch) < max_batch_size:
         try:
-            request = request_queue.get(
-                timeout=_clamp(
-                    x=inter_event_time,
-                    low=1e-12,  # 0 = "block forever", so just use something tiny
-                    high=remaining_time,
-                ),
+            # 0 = "block forever", so just use something tiny
+            request = get_request(
+                timeout=max(1e-12, min(inter_event_time, remaining_time))
             )
-            if isinstance(request, RequestFinish):
-                return True, batch
-
-            batch.append(request)
-            remaining_time = batch_time - (clock() - batch_start_time)
-
         except queue.Empty:
             break
+        if isinstance(request, RequestFinish):
+            return True, batch
+
+        batch.append(request)
+        remaining_time = deadline - clock()
 
     return False, batch
 
@@ -116,15 +143,27 @@ class StepPrepare:
                 max_batch_size=self._max_batch_size,
             )
             if batch:
-                prepare_response = self._prepare_batch(batch)
+                try:
+                    prepare_response = self._prepare_batch(batch)
+                except Exception as e:
+                    # fail the whole batch rather than leaving its callers blocked
+                    for prepare_request in batch:
+                        prepare_request.result_future.set_exception(e)
+                    if finish:
+                        break
+                    continue
                 # send responses
                 for prepare_request in batch:
-                    name = prepare_request.file_spec["name"]
-                    response_file = prepare_response[name]
-                    upload_url = response_file["uploadUrl"]
-                    upload_headers = response_file["uploadHeaders"]
-                    birth_artifact_id = response_file["artifact"]["id"]
-                    prepare_request.response_queue.put(
+                    try:
+                        name = prepare_request.file_spec["name"]
+                        response_file = prepare_response[name]
+                        upload_url = response_file["uploadUrl"]
+                        upload_headers = response_file["uploadHeaders"]
+                        birth_artifact_id = response_file["artifact"]["id"]
+                    except Exception as e:
+                        prepare_request.result_future.set_exception(e)
+                        continue
+                    prepare_request.result_future.set_result(
                         ResponsePrepare(upload_url, upload_headers, birth_artifact_id)
                     )
             if finish:
@@ -142,23 +181,34 @@ class StepPrepare:
                 an uploadUrl key. The value of the uploadUrl key is None if the file
                 already exists, or a url string if the file should be uploaded.
         """
-        return self._api.create_artifact_files([req.file_spec for req in batch])
+        # identical specs get identical responses (keyed by name), so only send each once
+        file_specs: Dict[
+            Tuple[Optional[str], str, Optional[str]], "CreateArtifactFileSpecInput"
+        ] = {}
+        for req in batch:
+            spec = req.file_spec
+            key = (spec.get("artifactID"), spec["name"], spec.get("md5"))
+            file_specs.setdefault(key, spec)
+        return self._api.create_artifact_files(list(file_specs.values()))
 
     def prepare_async(
         self, file_spec: "CreateArtifactFileSpecInput"
-    ) -> "queue.Queue[ResponsePrepare]":
+    ) -> "concurrent.futures.Future[ResponsePrepare]":
         """Request the backend to prepare a file for upload.
 
         Returns:
-            response_queue: a queue containing the prepare result. The prepare result is
-                either a file upload url, or None if the file doesn't need to be uploaded.
+            result_future: a future resolving to the prepare result. The prepare result
+                is either a file upload url, or None if the file doesn't need to be
+                uploaded.
         """
-        response_queue: "queue.Queue[ResponsePrepare]" = queue.Queue()
-        self._request_queue.put(RequestPrepare(file_spec, response_queue))
-        return response_queue
+        result_future: "concurrent.futures.Future[ResponsePrepare]" = (
+            concurrent.futures.Future()
+        )
+        self._request_queue.put(RequestPrepare(file_spec, result_future))
+        return result_future
 
     def prepare(self, file_spec: "CreateArtifactFileSpecInput") -> ResponsePrepare:
-        return self.prepare_async(file_spec).get()
+        return self.prepare_async(file_spec).result()
 
     def start(self) -> None:
         self._thread.start()
@@ -1,10 +1,16 @@
+import fnmatch
+import functools
+import io
 import json
 import logging
 import os
 import shlex
 import shutil
 import sys
+import tarfile
 import tempfile
+import time
+from dataclasses import dataclass
 from typing import Any, Dict, List, Optional, Tuple
 
 import pkg_resources
@@ -43,6 +49,8 @@ DEFAULT_ENTRYPOINT = "_wandb_default_entrypoint"
 DEFAULT_CUDA_VERSION = "10.0"
 
 
+# only successful checks are cached, a missing docker is re-checked on the next call
+@functools.lru_cache(maxsize=1)
 def validate_docker_installation() -> None:
     """Verify if Docker is installed on host machine."""
     if not find_executable("docker"):
@@ -485,36 +493,117 @@ def _get_docker_image_uri(name: Optional[str], work_dir: str, image_id: str) ->
     return name + version_string
 
 
+# files from the project dir that never belong in the build context
+_BUILD_CTX_IGNORE_PATTERNS = ("fsmonitor--daemon.ipc",)
+
+
+@dataclass
+class _BuildCtxEntry:
+    """A file or directory in the build context, copied from path or written from contents."""
+
+    arcname: str
+    path: Optional[str] = None
+    contents: Optional[str] = None
+
+
+def _docker_build_ctx_entries(
+    launch_project: LaunchProject,
+    dockerfile_contents: str,
+) -> List[_BuildCtxEntry]:
+    """Describe the build context layout, later entries replace earlier ones."""
+    assert launch_project.project_dir is not None
+    entries = [
+        _BuildCtxEntry("src", path=launch_project.project_dir),
+        _BuildCtxEntry(
+            "_wandb_bootstrap.py",
+            path=os.path.join(
+                os.path.dirname(__file__), "templates", "_wandb_bootstrap.py"
+            ),
+        ),
+    ]
+    if launch_project.python_version:
+        entries.append(
+            _BuildCtxEntry(
+                "src/runtime.txt",
+                contents=f"python-{launch_project.python_version}",
+            )
+        )
+    # TODO: we likely don't need to pass the whole git repo into the container
+    # entries.append(_BuildCtxEntry(".dockerignore", contents="**/.git"))
+    entries.append(
+        _BuildCtxEntry(_GENERATED_DOCKERFILE_NAME, contents=dockerfile_contents)
+    )
+    return entries
+
+
 def _create_docker_build_ctx(
     launch_project: LaunchProject,
     dockerfile_contents: str,
 ) -> str:
     """Creates build context temp dir containing Dockerfile and project code, returning path to temp dir."""
     directory = tempfile.mkdtemp()
-    dst_path = os.path.join(directory, "src")
-    assert launch_project.project_dir is not None
-    shutil.copytree(
-        src=launch_project.project_dir,
-        dst=dst_path,
-        symlinks=True,
-        ignore=shutil.ignore_patterns("fsmonitor--daemon.ipc"),
-    )
-    shutil.copy(
-        os.path.join(os.path.dirname(__file__), "templates", "_wandb_bootstrap.py"),
-        os.path.join(directory),
-    )
-    if launch_project.python_version:
-        runtime_path = os.path.join(dst_path, "runtime.txt")
-        with open(runtime_path, "w") as fp:
-            fp.write(f"python-{launch_project.python_version}")
-    # TODO: we likely don't need to pass the whole git repo into the container
-    # with open(os.path.join(directory, ".dockerignore"), "w") as f:
-    #    f.write("**/.git")
-    with open(os.path.join(directory, _GENERATED_DOCKERFILE_NAME), "w") as handle:
-        handle.write(dockerfile_contents)
+    for entry in _docker_build_ctx_entries(launch_project, dockerfile_contents):
+        dst_path = os.path.join(directory, entry.arcname)
+        if entry.contents is not None:
+            with open(dst_path, "w") as handle:
+                handle.write(entry.contents)
+        elif entry.path is not None and os.path.isdir(entry.path):
+            shutil.copytree(
+                src=entry.path,
+                dst=dst_path,
+                symlinks=True,
+                ignore=shutil.ignore_patterns(*_BUILD_CTX_IGNORE_PATTERNS),
+            )
+        elif entry.path is not None:
+            shutil.copy(entry.path, dst_path)
     return directory
 
 
+def _add_docker_build_ctx(
+    context_tar: tarfile.TarFile,
+    launch_project: LaunchProject,
+    dockerfile_contents: str,
+) -> None:
+    """Adds the build context to a tar archive, laid out as in _create_docker_build_ctx."""
+    entries = _docker_build_ctx_entries(launch_project, dockerfile_contents)
+    # a tar keeps every member, so drop copied files that a later entry replaces
+    generated = {entry.arcname for entry in entries if entry.contents is not None}
+
+    def _filter(tarinfo: tarfile.TarInfo) -> Optional[tarfile.TarInfo]:
+        name = os.path.basename(tarinfo.name)
+        if any(fnmatch.fnmatch(name, p) for p in _BUILD_CTX_IGNORE_PATTERNS):
+            return None
+        if tarinfo.name in generated:
+            return None
+        return tarinfo
+
+    for entry in entries:
+        if entry.contents is not None:
+            _add_tar_file_contents(context_tar, entry.arcname, entry.contents)
+        elif entry.path is not None:
+            context_tar.add(entry.path, arcname=entry.arcname, filter=_filter)
+
+
+def _add_tar_file_contents(
+    context_tar: tarfile.TarFile, arcname: str, contents: str
+) -> None:
+    data = contents.encode("utf-8")
+    tarinfo = tarfile.TarInfo(arcname)
+    tarinfo.size = len(data)
+    tarinfo.mode = 0o644
+    tarinfo.mtime = int(time.time())
+    context_tar.addfile(tarinfo, io.BytesIO(data))
+
+
+def _remove_docker_build_ctx(build_ctx_path: str) -> None:
+    """Delete a build context temp dir created by _create_docker_build_ctx."""
+    try:
+        shutil.rmtree(build_ctx_path)
+    except Exception:
+        _msg = f"{LOG_PREFIX}Temporary docker context dir {build_ctx_path} was not deleted."
+        _logger.info(_msg)
+
+
 def join(split_command: List[str]) -> str:
     """
     Return a shell-escaped string from *split_command*.
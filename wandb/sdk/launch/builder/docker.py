@@ -1,4 +1,3 @@
-import logging
 import os
 from typing import Any, Dict, Optional
 
@@ -15,12 +14,12 @@ from .._project_spec import (
 from ..utils import LOG_PREFIX, LaunchError, sanitize_wandb_api_key
 from .build import (
     _create_docker_build_ctx,
+    _remove_docker_build_ctx,
     generate_dockerfile,
     validate_docker_installation,
 )
 
 _GENERATED_DOCKERFILE_NAME = "Dockerfile.wandb-autogenerated"
-_logger = logging.getLogger(__name__)
 
 
 class DockerBuilder(AbstractBuilder):
@@ -57,12 +56,8 @@ class DockerBuilder(AbstractBuilder):
             docker.build(tags=[image_uri], file=dockerfile, context_path=build_ctx_path)
         except docker.DockerError as e:
             raise LaunchError(f"Error communicating with docker client: {e}")
-
-        try:
-            os.remove(build_ctx_path)
-        except Exception:
-            _msg = f"{LOG_PREFIX}Temporary docker context file {build_ctx_path} was not deleted."
-            _logger.info(_msg)
+        finally:
+            _remove_docker_build_ctx(build_ctx_path)
 
         if repository:
             reg, tag = image_uri.split(":")
@@ -1,10 +1,12 @@
-import base64
+import concurrent.futures
+import functools
+import gzip
 import json
 import os
 import tarfile
-import tempfile
+import threading
 import time
-from typing import Any, Dict, Optional
+from typing import IO, Any, Callable, Dict, List, Optional
 
 import kubernetes  # type: ignore
 from kubernetes import client
@@ -25,24 +27,158 @@ from ..utils import (
     get_kube_context_and_api_client,
     sanitize_wandb_api_key,
 )
-from .build import _create_docker_build_ctx, generate_dockerfile
+from .build import _add_docker_build_ctx, generate_dockerfile
 
 _DEFAULT_BUILD_TIMEOUT_SECS = 1800  # 30 minute build timeout
+_KANIKO_IMAGE = "gcr.io/kaniko-project/executor:v1.8.0"
+_KANIKO_ARGS_TEMPLATE = (
+    "--context={context}",
+    "--dockerfile=/etc/config/Dockerfile",
+    "--destination={destination}",
+    "--cache=true",
+    "--cache-repo={repository}",
+    "--snapshotMode={snapshot_mode}",
+)
+# redo is the safe default, time is faster for large images but can miss changes
+_KANIKO_SNAPSHOT_MODES = ("full", "redo", "time")
+# gzip is the bottleneck when packaging the build context, favor speed over ratio
+_BUILD_CONTEXT_COMPRESSLEVEL = 1
+# read context files in large chunks rather than tarfile's default 16 KiB
+_TAR_COPY_BUFSIZE = 1 << 20
+
+
+@functools.lru_cache(maxsize=1)
+def _s3_client() -> Any:
+    """Return an S3 client shared across builds, so its connection pool is reused."""
+    boto3 = get_module(
+        "boto3",
+        "AWS cloud provider requires boto3, install with pip install wandb[launch]",
+    )
+    botocore_config = get_module(
+        "botocore.config",
+        "aws cloud-provider requires botocore,  install with pip install wandb[launch]",
+    )
+    # room for the concurrent multipart upload threads
+    config = botocore_config.Config(max_pool_connections=32)
+    return boto3.client("s3", config=config)
+
+
+@functools.lru_cache(maxsize=1)
+def _gcs_client() -> Any:
+    """Return a GCS client shared across builds, so its session is reused."""
+    storage = get_module(
+        "google.cloud.storage",
+        "gcp provider requires google-cloud-storage,  install with pip install wandb[launch]",
+    )
+    return storage.Client()
+
+
+@functools.lru_cache(maxsize=32)
+def _docker_ecr_config_json(registry: Optional[str]) -> str:
+    """Return the docker config.json that has kaniko authenticate to ECR."""
+    if registry is None:
+        return json.dumps({"credsStore": "ecr-login"})
+    return json.dumps({"credHelpers": {registry: "ecr-login"}})
+
+
+def _write_build_context(
+    launch_project: LaunchProject, dockerfile_contents: str, fileobj: IO[bytes]
+) -> None:
+    """Write the build context as a gzipped tar archive to fileobj."""
+    with gzip.GzipFile(
+        fileobj=fileobj, mode="wb", compresslevel=_BUILD_CONTEXT_COMPRESSLEVEL
+    ) as context_gz, tarfile.open(fileobj=context_gz, mode="w|") as context_tar:
+        # set after construction, older pythons don't accept copybufsize in open
+        context_tar.copybufsize = _TAR_COPY_BUFSIZE
+        _add_docker_build_ctx(context_tar, launch_project, dockerfile_contents)
+
+
+class _BuildContextReader:
+    """Read end of the build context pipe, handed to the upload.
+
+    Reaching the end of the pipe means the producer is done, so if it failed the
+    read raises instead of returning the end of a truncated archive. The upload
+    then aborts rather than storing a partial build context.
+    """
+
+    def __init__(
+        self, reader: IO[bytes], producer: threading.Thread, errors: List[Exception]
+    ) -> None:
+        self._reader = reader
+        self._producer = producer
+        self._errors = errors
+        self._position = 0
+
+    def read(self, size: Optional[int] = -1) -> bytes:
+        data = self._reader.read(size)
+        self._position += len(data)
+        # a short read from the blocking pipe only happens at the end of the stream
+        if size is None or size < 0 or len(data) < size:
+            self._producer.join()
+            if self._errors:
+                raise LaunchError(
+                    f"Failed to write build context: {self._errors[0]}"
+                ) from self._errors[0]
+        return data
+
+    def readable(self) -> bool:
+        return True
+
+    def seekable(self) -> bool:
+        return False
+
+    def tell(self) -> int:
+        return self._position
+
+
+def _stream_build_context(
+    launch_project: LaunchProject,
+    dockerfile_contents: str,
+    upload: Callable[[_BuildContextReader], None],
+) -> None:
+    """Stream the gzipped build context to upload through a pipe.
+
+    The archive is produced on a background thread while upload consumes it, so
+    compression overlaps with the network transfer and nothing is staged on disk.
+    """
+    read_fd, write_fd = os.pipe()
+    errors: List[Exception] = []
+
+    def _produce() -> None:
+        try:
+            with os.fdopen(write_fd, "wb") as writer:
+                _write_build_context(launch_project, dockerfile_contents, writer)
+        except Exception as e:
+            errors.append(e)
+
+    producer = threading.Thread(target=_produce, daemon=True)
+    producer.start()
+    with os.fdopen(read_fd, "rb") as reader:
+        try:
+            upload(_BuildContextReader(reader, producer, errors))
+        except Exception:
+            # closing the read end unblocks the producer with a broken pipe
+            reader.close()
+            producer.join()
+            raise
+        # make sure the producer is never left blocked on a full pipe
+        while reader.read(1 << 16):
+            pass
+    producer.join()
+    if errors:
+        raise LaunchError(f"Failed to write build context: {errors[0]}") from errors[0]
 
 
 def _create_dockerfile_configmap(
-    config_map_name: str, context_path: str
+    config_map_name: str, dockerfile_contents: str
 ) -> client.V1ConfigMap:
-    with open(os.path.join(context_path, "Dockerfile.wandb-autogenerated"), "rb") as f:
-        docker_file_bytes = f.read()
-
+    # the dockerfile is utf-8 text, so it can go in data rather than base64 encoded
+    # binary_data, which is a third larger
     build_config_map = client.V1ConfigMap(
         metadata=client.V1ObjectMeta(
             name=config_map_name, namespace="wandb", labels={"wandb": "launch"}
         ),
-        binary_data={
-            "Dockerfile": base64.b64encode(docker_file_bytes).decode("UTF-8"),
-        },
+        data={"Dockerfile": dockerfile_contents},
         immutable=True,
     )
     return build_config_map
@@ -51,18 +187,32 @@ def _create_dockerfile_configmap(
 def _wait_for_completion(
     batch_client: client.BatchV1Api, job_name: str, deadline_secs: Optional[int] = None
 ) -> bool:
-    start_time = time.time()
+    # watch the job instead of polling its status, so we return as soon as the
+    # job transitions rather than up to a full poll interval later
+    wandb.termlog(f"{LOG_PREFIX}Waiting for build job to complete...")
+    deadline = None if deadline_secs is None else time.monotonic() + deadline_secs
+    watcher = kubernetes.watch.Watch()
     while True:
-        job = batch_client.read_namespaced_job_status(job_name, "wandb")
-        if job.status.succeeded is not None and job.status.succeeded >= 1:
-            return True
-        elif job.status.failed is not None and job.status.failed >= 1:
-            return False
-        wandb.termlog(f"{LOG_PREFIX}Waiting for build job to complete...")
-        if deadline_secs is not None and time.time() - start_time > deadline_secs:
-            return False
-
-        time.sleep(5)
+        timeout_secs = None
+        if deadline is not None:
+            timeout_secs = int(deadline - time.monotonic())
+            if timeout_secs <= 0:
+                return False
+        for event in watcher.stream(
+            batch_client.list_namespaced_job,
+            namespace="wandb",
+            field_selector=f"metadata.name={job_name}",
+            timeout_seconds=timeout_secs,
+        ):
+            status = event["object"].status
+            if status.succeeded is not None and status.succeeded >= 1:
+                watcher.stop()
+                return True
+            elif status.failed is not None and status.failed >= 1:
+                watcher.stop()
+                return False
+        # the watch isn't retried once it has a timeout, so if the connection
+        # dropped before the deadline, watch again for the time remaining
 
 
 class KanikoBuilder(AbstractBuilder):
@@ -87,6 +237,13 @@ class KanikoBuilder(AbstractBuilder):
             # kaniko pod will have access to build context store and ecr
             wandb.termlog(f"{LOG_PREFIX}Kaniko builder running in instance mode")
 
+        self.snapshot_mode = builder_config.get("snapshot-mode", "redo")
+        if self.snapshot_mode not in _KANIKO_SNAPSHOT_MODES:
+            raise LaunchError(
+                "Kaniko snapshot-mode must be one of: {}".format(
+                    ", ".join(_KANIKO_SNAPSHOT_MODES)
+                )
+            )
         self.build_context_store = builder_config.get("build-context-store", None)
         if self.build_context_store is None:
             raise LaunchError("build-context-store is not set in cloud-provider")
@@ -105,82 +262,62 @@ class KanikoBuilder(AbstractBuilder):
     ) -> None:
         if self.cloud_provider.lower() == "aws":
             if not self.instance_mode:
-                ecr_config_map = client.V1ConfigMap(
-                    api_version="v1",
-                    kind="ConfigMap",
-                    metadata=client.V1ObjectMeta(
-                        name="docker-config",
-                        namespace="wandb",
-                    ),
-                    data={"config.json": json.dumps({"credsStore": "ecr-login"})},
-                    immutable=True,
-                )
+                docker_config = _docker_ecr_config_json(None)
             else:
                 wandb.termlog(
                     f"{LOG_PREFIX}Builder not supplied with credentials, assuming instance mode."
                 )
-                d = {
-                    "config.json": json.dumps(
-                        {"credHelpers": {repository.split(":")[0]: "ecr-login"}}
-                    )
-                }
-                ecr_config_map = client.V1ConfigMap(
-                    api_version="v1",
-                    kind="ConfigMap",
-                    metadata=client.V1ObjectMeta(
-                        name="docker-config",
-                        namespace="wandb",
-                    ),
-                    data=d,
-                    immutable=True,
-                )
+                docker_config = _docker_ecr_config_json(repository.split(":")[0])
+            ecr_config_map = client.V1ConfigMap(
+                api_version="v1",
+                kind="ConfigMap",
+                metadata=client.V1ObjectMeta(
+                    name="docker-config",
+                    namespace="wandb",
+                ),
+                data={"config.json": docker_config},
+                immutable=True,
+            )
             corev1_client.create_namespaced_config_map("wandb", ecr_config_map)
 
     def _delete_docker_ecr_config_map(self, client: client.CoreV1Api) -> None:
         client.delete_namespaced_config_map("docker-config", "wandb")
 
-    def _upload_build_context(self, run_id: str, context_path: str) -> str:
-        # creat a tar archive of the build context and upload it to s3
-        context_file = tempfile.NamedTemporaryFile(delete=False)
-        with tarfile.TarFile.open(fileobj=context_file, mode="w:gz") as context_tgz:
-            context_tgz.add(context_path, arcname=".")
-        context_file.close()
+    def _upload_build_context(
+        self, run_id: str, launch_project: LaunchProject, dockerfile_contents: str
+    ) -> str:
+        # stream a tar archive of the build context straight to the context store
         if self.cloud_provider.lower() == "aws":
-            boto3 = get_module(
-                "boto3",
-                "AWS cloud provider requires boto3, install with pip install wandb[launch]",
-            )
-            botocore = get_module(
-                "botocore",
-                "aws cloud-provider requires botocore,  install with pip install wandb[launch]",
-            )
-
-            s3_client = boto3.client("s3")
-
+            s3_client = _s3_client()
             try:
-                s3_client.upload_file(
-                    context_file.name, self.build_context_store, f"{run_id}.tgz"
+                _stream_build_context(
+                    launch_project,
+                    dockerfile_contents,
+                    lambda context_file: s3_client.upload_fileobj(
+                        context_file, self.build_context_store, f"{run_id}.tgz"
+                    ),
                 )
-                os.remove(context_file.name)
-            except botocore.exceptions.ClientError as e:
-                os.remove(context_file.name)
+            except LaunchError:
+                raise
+            except Exception as e:
                 raise LaunchError(f"Failed to upload build context to S3: {e}")
             return f"s3://{self.build_context_store}/{run_id}.tgz"
         # TODO: support gcp and azure cloud providers
         elif self.cloud_provider.lower() == "gcp":
-            storage = get_module(
-                "google.cloud.storage",
-                "gcp provider requires google-cloud-storage,  install with pip install wandb[launch]",
-            )
-
-            storage_client = storage.Client()
+            storage_client = _gcs_client()
             try:
                 bucket = storage_client.bucket(self.build_context_store)
                 blob = bucket.blob(f"{run_id}.tgz")
-                blob.upload_from_filename(context_file.name)
-                os.remove(context_file.name)
+                # resumable upload of unknown size, only finalized at the end of
+                # the stream so a failed build context never lands in the bucket
+                _stream_build_context(
+                    launch_project,
+                    dockerfile_contents,
+                    lambda context_file: blob.upload_from_file(context_file),
+                )
+            except LaunchError:
+                raise
             except Exception as e:
-                os.remove(context_file.name)
                 raise LaunchError(f"Failed to upload build context to GCP: {e}")
             return f"gs://{self.build_context_store}/{run_id}.tgz"
         else:
@@ -245,7 +382,6 @@ class KanikoBuilder(AbstractBuilder):
             sanitize_wandb_api_key(entry_cmd),
             sanitize_wandb_api_key(dockerfile_str),
         )
-        context_path = _create_docker_build_ctx(launch_project, dockerfile_str)
         run_id = launch_project.run_id
 
         _, api_client = get_kube_context_and_api_client(
@@ -254,9 +390,11 @@ class KanikoBuilder(AbstractBuilder):
         build_job_name = f"{self.build_job_name}-{run_id}"
         config_map_name = f"{self.config_map_name}-{run_id}"
 
-        build_context = self._upload_build_context(run_id, context_path)
+        build_context = self._upload_build_context(
+            run_id, launch_project, dockerfile_str
+        )
         dockerfile_config_map = _create_dockerfile_configmap(
-            config_map_name, context_path
+            config_map_name, dockerfile_str
         )
         build_job = self._create_kaniko_job(
             build_job_name,
@@ -272,8 +410,21 @@ class KanikoBuilder(AbstractBuilder):
         core_v1 = client.CoreV1Api(api_client)
 
         try:
-            core_v1.create_namespaced_config_map("wandb", dockerfile_config_map)
-            self._create_docker_ecr_config_map(core_v1, repository)
+            # the config maps are independent, create them concurrently. the job
+            # is only created once both exist so its pod can mount them right away
+            with concurrent.futures.ThreadPoolExecutor(max_workers=2) as executor:
+                config_map_futures = [
+                    executor.submit(
+                        core_v1.create_namespaced_config_map,
+                        "wandb",
+                        dockerfile_config_map,
+                    ),
+                    executor.submit(
+                        self._create_docker_ecr_config_map, core_v1, repository
+                    ),
+                ]
+                for future in config_map_futures:
+                    future.result()
             batch_v1.create_namespaced_job("wandb", build_job)
 
             # wait for double the job deadline since it might take time to schedule
@@ -351,28 +502,21 @@ class KanikoBuilder(AbstractBuilder):
             ]
         # Configurate Pod template container
         args = [
-            f"--context={build_context_path}",
-            "--dockerfile=/etc/config/Dockerfile",
-            f"--destination={image_tag}",
-            "--cache=true",
-            f"--cache-repo={repository}",
-            "--snapshotMode=redo",
-        ]
-        if env is not None:
-            container = client.V1Container(
-                name="wandb-container-build",
-                image="gcr.io/kaniko-project/executor:v1.8.0",
-                args=args,
-                volume_mounts=volume_mounts,
-                env=[env],
-            )
-        else:
-            container = client.V1Container(
-                name="wandb-container-build",
-                image="gcr.io/kaniko-project/executor:v1.8.0",
-                args=args,
-                volume_mounts=volume_mounts,
+            arg.format(
+                context=build_context_path,
+                destination=image_tag,
+                repository=repository,
+                snapshot_mode=self.snapshot_mode,
             )
+            for arg in _KANIKO_ARGS_TEMPLATE
+        ]
+        container = client.V1Container(
+            name="wandb-container-build",
+            image=_KANIKO_IMAGE,
+            args=args,
+            volume_mounts=volume_mounts,
+            env=[env] if env is not None else None,
+        )
         # Create and configure a spec section
         template = client.V1PodTemplateSpec(
             metadata=client.V1ObjectMeta(labels={"wandb": "launch"}),
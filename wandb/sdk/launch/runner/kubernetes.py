@@ -1,9 +1,11 @@
 import base64
+import datetime
 import json
 import logging
 import time
-from typing import Any, Dict, List, Optional
+from typing import Any, Dict, List, Optional, Tuple
 
+import kubernetes  # type: ignore
 from kubernetes import client  # type: ignore
 from kubernetes.client.api.batch_v1_api import BatchV1Api  # type: ignore
 from kubernetes.client.api.core_v1_api import CoreV1Api  # type: ignore
@@ -26,6 +28,8 @@ from ..utils import (
 from .abstract import AbstractRun, AbstractRunner, Status
 
 TIMEOUT = 5
+# longest wait between status checks while a job is running
+_STATUS_CHECK_INTERVAL = 5
 MAX_KUBERNETES_RETRIES = (
     60  # default 10 second loop time on the agent, this is 10 minutes
 )
@@ -52,6 +56,7 @@ class KubernetesSubmittedRun(AbstractRun):
             name=self.name, namespace=self.namespace
         )
         self._fail_count = 0
+        self._resource_version: Optional[str] = None
         self.pod_names = pod_names
         self.secret = secret
 
@@ -70,15 +75,36 @@ class KubernetesSubmittedRun(AbstractRun):
             wandb.termlog(f"{LOG_PREFIX}Job {self.name} status: {status}")
             if status.state != "running":
                 break
-            time.sleep(5)
+            self._wait_for_job_update(_STATUS_CHECK_INTERVAL)
         return (
             status.state == "finished"
         )  # todo: not sure if this (copied from aws runner) is the right approach? should we return false on failure
 
+    def _wait_for_job_update(self, timeout_secs: int) -> None:
+        # block on a watch of the job instead of sleeping, so a finished job is
+        # noticed right away. the timeout keeps checking the pod periodically,
+        # since a pod that fails to start doesn't update the job
+        watcher = kubernetes.watch.Watch()
+        try:
+            for _ in watcher.stream(
+                self.batch_api.list_namespaced_job,
+                namespace=self.namespace,
+                field_selector=f"metadata.name={self.name}",
+                resource_version=self._resource_version,
+                timeout_seconds=timeout_secs,
+            ):
+                watcher.stop()
+                break
+        except Exception as e:
+            # e.g. the resource version expired, fall back to polling
+            _logger.info(f"Watch on job {self.name} failed: {e}")
+            time.sleep(timeout_secs)
+
     def get_status(self) -> Status:
         job_response = self.batch_api.read_namespaced_job_status(
             name=self.name, namespace=self.namespace
         )
+        self._resource_version = job_response.metadata.resource_version
         status = job_response.status
         try:
             self.core_api.read_namespaced_pod_log(
@@ -415,6 +441,30 @@ class KubernetesRunner(AbstractRunner):
         return submitted_job
 
 
+# ECR authorization tokens are valid for 12 hours, so reuse them across runs and
+# only refresh once they are close to expiring
+_ECR_TOKEN_REFRESH_MARGIN = datetime.timedelta(minutes=30)
+_ecr_authorization_token: Optional[Tuple[str, datetime.datetime]] = None
+
+
+def _get_ecr_authorization_token() -> str:
+    global _ecr_authorization_token
+    if _ecr_authorization_token is not None:
+        token, expires_at = _ecr_authorization_token
+        now = datetime.datetime.now(datetime.timezone.utc)
+        if expires_at - now > _ECR_TOKEN_REFRESH_MARGIN:
+            return token
+    boto3 = get_module(
+        "boto3", "AWS ECR requires boto3,  install with pip install wandb[launch]"
+    )
+    ecr_client = boto3.client("ecr")
+    authorization_data = ecr_client.get_authorization_token()["authorizationData"][0]
+    token = authorization_data["authorizationToken"]
+    expires_at = authorization_data.get("expiresAt")
+    _ecr_authorization_token = (token, expires_at) if expires_at is not None else None
+    return token
+
+
 def maybe_create_imagepull_secret(
     core_api: "CoreV1Api",
     registry_config: Dict[str, Any],
@@ -429,14 +479,8 @@ def maybe_create_imagepull_secret(
         and registry_config.get("url") is not None
         and registry_config.get("credentials") is not None
     ):
-        boto3 = get_module(
-            "boto3", "AWS ECR requires boto3,  install with pip install wandb[launch]"
-        )
-        ecr_client = boto3.client("ecr")
         try:
-            encoded_token = ecr_client.get_authorization_token()["authorizationData"][
-                0
-            ]["authorizationToken"]
+            encoded_token = _get_ecr_authorization_token()
             decoded_token = base64.b64decode(encoded_token.encode()).decode()
             uname, token = decoded_token.split(":")
         except Exception as e:
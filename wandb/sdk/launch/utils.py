@@ -1,4 +1,5 @@
 # heavily inspired by https://github.com/mlflow/mlflow/blob/master/mlflow/projects/utils.py
+import functools
 import logging
 import os
 import platform
@@ -599,16 +600,28 @@ def get_kube_context_and_api_client(
             context = active_context
 
         kubernetes.config.load_kube_config(config_file, context["name"])
-        api_client = kubernetes.config.new_client_from_config(
-            config_file, context=context["name"]
-        )
+        api_client = _get_kube_api_client(kubernetes, config_file, context["name"])
         return context, api_client
     else:
         kubernetes.config.load_incluster_config()
-        api_client = kubernetes.client.api_client.ApiClient()
+        api_client = _get_kube_api_client(kubernetes, None, None)
         return context, api_client
 
 
+# the api client owns the connection pool, share it across runs and builds
+# instead of reconnecting to the cluster for every job. the context is resolved
+# by the caller on every call, so switching contexts picks up a new client
+@functools.lru_cache(maxsize=8)
+def _get_kube_api_client(
+    kubernetes: Any,  # noqa: F811
+    config_file: Optional[str],
+    context_name: Optional[str],
+) -> Any:
+    if context_name is None:
+        return kubernetes.client.api_client.ApiClient()
+    return kubernetes.config.new_client_from_config(config_file, context=context_name)
+
+
 def resolve_build_and_registry_config(
     default_launch_config: Optional[Dict[str, Any]],
     build_config: Optional[Dict[str, Any]],